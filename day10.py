@@ -1,8 +1,9 @@
 from dataclasses import dataclass
-import math
 import re
 from typing import Self, Tuple
 
+import numpy as np
+
 
 @dataclass
 class Point:
@@ -21,13 +22,13 @@ class Point:
 
         return cls(*(int(s.strip()) for s in [x, y, vx, vy]))
 
-    def advance(self):
-        self.x += self.vx
-        self.y += self.vy
+    def advance(self, k: int = 1):
+        self.x += self.vx * k
+        self.y += self.vy * k
 
-    def rewind(self):
-        self.x -= self.vx
-        self.y -= self.vy
+    def rewind(self, k: int = 1):
+        self.x -= self.vx * k
+        self.y -= self.vy * k
 
 
 class PointSet:
@@ -35,15 +36,15 @@ class PointSet:
         self.points = points
         self.time = 0
 
-    def advance(self) -> None:
-        self.time += 1
+    def advance(self, k: int = 1) -> None:
+        self.time += k
         for point in self.points:
-            point.advance()
+            point.advance(k)
 
-    def rewind(self) -> None:
-        self.time -= 1
+    def rewind(self, k: int = 1) -> None:
+        self.time -= k
         for point in self.points:
-            point.rewind()
+            point.rewind(k)
 
     def minmax_x(self) -> Tuple[int, int]:
         xs = [point.x for point in self.points]
@@ -58,8 +59,45 @@ class PointSet:
         miny, maxy = self.minmax_y()
         return (maxx - minx) + (maxy - miny)
 
+    def bounds_after(self, k: int) -> int:
+        xs = [p.x + p.vx * k for p in self.points]
+        ys = [p.y + p.vy * k for p in self.points]
+        return (max(xs) - min(xs)) + (max(ys) - min(ys))
+
+    def moves_together(self) -> bool:
+        vxs = {p.vx for p in self.points}
+        vys = {p.vy for p in self.points}
+        return len(vxs) == 1 and len(vys) == 1
+
+    def steps_to_converge(self) -> int:
+        # bounds() is a sum of max-minus-min of linear functions, so it's
+        # convex in time: once it starts growing it never shrinks again.
+        # That means we can binary search for the first step after which
+        # it grows, rather than walking there one second at a time.
+        def grows(k):
+            return self.bounds_after(k + 1) > self.bounds_after(k)
+
+        if self.moves_together():
+            return 0  # it never gets any smaller
+
+        lo, hi = 1, 1
+        while not grows(hi):
+            lo, hi = hi + 1, hi * 2
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if grows(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+
+        return lo
+
+    def coords(self) -> set[Tuple[int, int]]:
+        return {(p.x, p.y) for p in self.points}
+
     def print(self):
-        grid = {(p.x, p.y) for p in self.points}
+        grid = self.coords()
         min_x, max_x = self.minmax_x()
         min_y, max_y = self.minmax_y()
 
@@ -69,23 +107,62 @@ class PointSet:
             print("".join(line))
 
 
-lights = None
-with open("d10.txt", "r") as f:
-    points = []
-    for line in f:
-        points.append(Point.from_line(line))
+# Same thing, but with x, y, vx and vy each held in one numpy array rather
+# than in a Point per light, for when there are millions of them.
+class ArrayPointSet(PointSet):
+    def __init__(self, x, y, vx, vy):
+        self.x, self.y, self.vx, self.vy = x, y, vx, vy
+        self.time = 0
+
+    @classmethod
+    def from_file(cls, filename: str) -> Self:
+        with open(filename, "r") as f:
+            text = f.read()
+
+        # blank out everything that isn't a number, and the rest is just
+        # x, y, vx, vy four at a time
+        text = text.translate(PUNCTUATION)
+        nums = np.fromstring(text, dtype=np.int64, sep=" ").reshape(-1, 4)
+        return cls(*(np.ascontiguousarray(col) for col in nums.T))
+
+    def advance(self, k: int = 1) -> None:
+        self.time += k
+        self.x += self.vx * k
+        self.y += self.vy * k
+
+    def rewind(self, k: int = 1) -> None:
+        self.advance(-k)
+
+    def minmax_x(self) -> Tuple[int, int]:
+        return int(self.x.min()), int(self.x.max())
+
+    def minmax_y(self) -> Tuple[int, int]:
+        return int(self.y.min()), int(self.y.max())
+
+    def bounds_after(self, k: int) -> int:
+        xs = self.x + self.vx * k
+        ys = self.y + self.vy * k
+        return int((xs.max() - xs.min()) + (ys.max() - ys.min()))
+
+    def moves_together(self) -> bool:
+        same_x = (self.vx == self.vx[0]).all()
+        same_y = (self.vy == self.vy[0]).all()
+        return bool(same_x and same_y)
+
+    def coords(self) -> set[Tuple[int, int]]:
+        return set(zip(self.x.tolist(), self.y.tolist()))
+
+
+PUNCTUATION = str.maketrans({c: " " for c in "positionvelcy=<>,"})
+
+
+def main():
+    lights = ArrayPointSet.from_file("d10.txt")
 
-    lights = PointSet(points)
+    lights.advance(lights.steps_to_converge())
+    lights.print()
+    print(f"\npart 2: {lights.time}")
 
-mindiff = math.inf
 
-while True:
-    lights.advance()
-    bounds = lights.bounds()
-    if bounds <= mindiff:
-        mindiff = bounds
-    else:
-        lights.rewind()
-        lights.print()
-        print(f"\npart 2: {lights.time}")
-        break
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,37 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import sys
+
+import numpy as np
+
+
 class Grid:
     def __init__(self, serial):
-        self.grid = {
-            (x, y): power_level(x, y, serial)
-            for x in range(1, 301)
-            for y in range(1, 301)
-        }
+        # summed-area table: sums[x][y] is the total power of every cell
+        # from (1, 1) to (x, y) inclusive, so any square is four lookups
+        self.sums = [[0] * 301 for _ in range(301)]
+
+        for x in range(1, 301):
+            row, above = self.sums[x], self.sums[x - 1]
+            running = 0
+            for y in range(1, 301):
+                running += power_level(x, y, serial)
+                row[y] = above[y] + running
 
     def square(self, x, y, size) -> int:
-        return sum(
-            self.grid[(this_x, this_y)]
-            for this_x in range(x, x + size)
-            for this_y in range(y, y + size)
-        )
+        top, bottom = self.sums[x - 1], self.sums[x + size - 1]
+        y2 = y + size - 1
+        return bottom[y2] - top[y2] - bottom[y - 1] + top[y - 1]
 
     def best_at_size(self, size):
         best = 0
         coords = (0, 0)
         for x in range(1, 301-size):
+            # this is just self.square() inlined, since it's the hot loop
+            top, bottom = self.sums[x - 1], self.sums[x + size - 1]
             for y in range(1, 301-size):
-                pl = self.square(x, y, size)
+                y2 = y + size - 1
+                pl = bottom[y2] - top[y2] - bottom[y - 1] + top[y - 1]
                 if pl > best:
                     coords = (x, y)
                     best = pl
@@ -29,9 +42,7 @@ class Grid:
         best = 0
         coords = (0, 0, 0)
 
-        # lol this going up to 20 is just a hack, but works
-        for size in range(1, 21):
-            print(f"checking size {size}")
+        for size in range(1, 301):
             pl, (x, y) = self.best_at_size(size)
             if pl > best:
                 coords = (x, y, size)
@@ -45,10 +56,183 @@ def power_level(x: int, y: int, serial) -> int:
     return (((((rack_id * y) + serial) * rack_id) % 1000) // 100) - 5
 
 
-grid = Grid(7347)
+# Everything below does the same searches for many serials at once, with one
+# (serials, 301, 301) summed-area tensor instead of a Grid per serial.
+
+BYTES_PER_SERIAL = 301 * 301 * 8 * 5  # the table plus per-size temporaries
+
+
+def summed_tensor(serials):
+    serials = np.asarray(serials, dtype=np.int64)[:, None, None]
+    xs = np.arange(1, 301, dtype=np.int64)[None, :, None]
+    ys = np.arange(1, 301, dtype=np.int64)[None, None, :]
+
+    rack_id = xs + 10
+    power = ((((rack_id * ys) + serials) * rack_id) % 1000) // 100 - 5
+
+    sums = np.zeros((len(serials), 301, 301), dtype=np.int64)
+    sums[:, 1:, 1:] = power.cumsum(axis=1).cumsum(axis=2)
+    return sums
+
+
+def best_squares_at_size(sums, size):
+    # Same scan as Grid.best_at_size: x and y from 1 to 300 - size, first
+    # strictly-positive best in x-major order, (0, 0) if nothing beats zero.
+    end = 300
+    top, bottom = slice(0, end - size), slice(size, end)
+    squares = (
+        sums[:, bottom, bottom]
+        - sums[:, top, bottom]
+        - sums[:, bottom, top]
+        + sums[:, top, top]
+    ).reshape(len(sums), -1)
+
+    idx = squares.argmax(axis=1)
+    best = squares[np.arange(len(sums)), idx]
+    xs, ys = np.divmod(idx, end - size)
+    xs = np.where(best > 0, xs + 1, 0)
+    ys = np.where(best > 0, ys + 1, 0)
+    return np.maximum(best, 0), xs, ys
+
+
+def best_for_chunk(serials):
+    sums = summed_tensor(serials)
+    _, x3, y3 = best_squares_at_size(sums, 3)
+
+    best = np.zeros(len(serials), dtype=np.int64)
+    coords = np.zeros((len(serials), 3), dtype=np.int64)
+    for size in range(1, 300):  # Grid's scan never fits a 300 square
+        pl, xs, ys = best_squares_at_size(sums, size)
+        better = pl > best
+        best[better] = pl[better]
+        found = np.stack([xs, ys, np.full_like(xs, size)], axis=1)
+        coords[better] = found[better]
+
+    return {
+        serial: ((int(x3[i]), int(y3[i])), tuple(int(n) for n in coords[i]))
+        for i, serial in enumerate(serials)
+    }
+
+
+def best_for_serials(serials, max_bytes=1 << 30, workers=None):
+    # Maps each serial to (best size-3 coords, best (x, y, size) overall).
+    # Serials are done together as one tensor if they fit in max_bytes;
+    # otherwise they're split into chunks that do, over a process pool.
+    serials = list(serials)
+    if not serials:
+        return {}
+
+    per_chunk = max(1, max_bytes // BYTES_PER_SERIAL)
+    if len(serials) <= per_chunk:
+        return best_for_chunk(serials)
+
+    chunks = [
+        serials[i:i + per_chunk] for i in range(0, len(serials), per_chunk)
+    ]
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in pool.map(best_for_chunk, chunks):
+            results.update(chunk)
+
+    return results
+
+
+# A long-lived front for Grid, for answering lots of queries against the
+# same handful of serials: keeps the most recently used grids (and whatever
+# answers we've already worked out for them) and throws out the oldest.
+class GridCache:
+    def __init__(self, max_grids=32):
+        self.max_grids = max_grids
+        self.grids = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry(self, serial):
+        if serial in self.grids:
+            self.hits += 1
+            self.grids.move_to_end(serial)
+            return self.grids[serial]
+
+        self.misses += 1
+        entry = self.grids[serial] = (Grid(serial), {})
+        if len(self.grids) > self.max_grids:
+            self.grids.popitem(last=False)
+            self.evictions += 1
+
+        return entry
+
+    def best_at_size(self, serial, size):
+        grid, answers = self._entry(serial)
+        if size not in answers:
+            answers[size] = grid.best_at_size(size)
+
+        return answers[size]
+
+    def best(self, serial):
+        grid, answers = self._entry(serial)
+        if "best" not in answers:
+            answers["best"] = grid.best()
+
+        return answers["best"]
+
+    def stats(self):
+        return {
+            "grids": len(self.grids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def answer_query(cache, words):
+    if words == ["stats"]:
+        return " ".join(f"{k}={v}" for k, v in cache.stats().items())
+
+    if len(words) == 1:
+        x, y, size = cache.best(int(words[0]))
+        return f"{x},{y},{size}"
+
+    if len(words) != 2:
+        raise ValueError(f"bad query: {' '.join(words)}")
+
+    serial, size = int(words[0]), int(words[1])
+    if not 1 <= size <= 300:
+        raise ValueError(f"size must be 1-300, not {size}")
+
+    power, (x, y) = cache.best_at_size(serial, size)
+    return f"{x},{y} {power}"
+
+
+def serve(cache, infile=sys.stdin, outfile=sys.stdout):
+    # One query per line: "<serial> <size>" for the best square at a size,
+    # "<serial>" for the best of any size, or "stats" for the counters.
+    for line in infile:
+        words = line.split()
+        if not words:
+            continue
+
+        try:
+            answer = answer_query(cache, words)
+        except ValueError as e:
+            answer = f"error: {e}"
+
+        print(answer, file=outfile, flush=True)
+
+
+def main():
+    if sys.argv[1:] == ["serve"]:
+        serve(GridCache())
+        return
+
+    grid = Grid(7347)
+
+    _, (x1, y1) = grid.best_at_size(3)
+    print(f"part 1: {x1},{y1}")
+
+    x2, y2, size = grid.best()
+    print(f"part 2: {x2},{y2},{size}")
 
-_, (x1, y1) = grid.best_at_size(3)
-print(f"part 1: {x1},{y1}")
 
-x2, y2, size = grid.best()
-print(f"part 2: {x2},{y2},{size}")
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,37 @@ def to_zero(indexes):
     return tuple(i + delta for i in indexes)
 
 
-class PlantLine:
+class CycleSkipping:
+    # Mixin for fast-forwarding a plant line: once a state repeats (up to a
+    # shift), it will keep repeating with the same period and drift, so we
+    # can jump whole periods at a time. Only the last `history` states are
+    # remembered, so cycles longer than that are just simulated through.
+    # Subclasses provide _state() -> (shift-free key, offset) and _shift().
+
+    def advance_to(self, generation, history=10_000):
+        seen = {}
+
+        while self.generation < generation:
+            key, offset = self._state()
+            if key in seen:
+                start, start_offset = seen[key]
+                period = self.generation - start
+                cycles = (generation - self.generation) // period
+                self._shift((offset - start_offset) * cycles)
+                self.generation += period * cycles
+                break
+
+            seen[key] = (self.generation, offset)
+            if len(seen) > history:
+                del seen[next(iter(seen))]
+
+            self.do_generation()
+
+        while self.generation < generation:
+            self.do_generation()
+
+
+class PlantLine(CycleSkipping):
     def __init__(self, line, rules):
         line = line.removeprefix("initial state: ")
         self.rules = rules
@@ -78,6 +108,104 @@ class PlantLine:
 
             prev = cur
 
+    def _state(self):
+        indexes = sorted(self.plant_indexes())
+        if not indexes:
+            return (), 0
+
+        return to_zero(indexes), indexes[0]
+
+    def _shift(self, delta):
+        shifted = defaultdict(bool)
+        for i, pot in self.pots.items():
+            shifted[i + delta] = pot
+
+        self.pots = shifted
+        self._min += delta
+        self._max += delta
+
+
+# Same thing, but the whole row is one big int (bit j is pot offset + j,
+# and bit 0 is always the leftmost plant), so a generation is a few dozen
+# whole-row bit operations instead of a dict lookup per pot.
+class BitPlantLine(CycleSkipping):
+    def __init__(self, line, rules):
+        line = line.removeprefix("initial state: ")
+        self.table = rules.table()
+        self.generation = 0
+
+        # ..... => # would mean infinitely many plants
+        assert not self.table[0]
+
+        digits = "".join("1" if c2b(c) else "0" for c in reversed(line))
+        self.bits = int(digits, 2)
+        self.offset = 0
+        self._normalize()
+
+    def _normalize(self):
+        if self.bits == 0:
+            return
+
+        low = (self.bits & -self.bits).bit_length() - 1
+        self.bits >>= low
+        self.offset += low
+
+    def __str__(self):
+        return "".join(
+            char_for(c == "1") for c in reversed(bin(self.bits)[2:])
+        )
+
+    def do_generation(self):
+        # pot offset + j - 2 of the next generation is bit j here; every
+        # pot that can change is within 2 of an existing plant
+        width = self.bits.bit_length() + 4
+        mask = (1 << width) - 1
+        here = self.bits << 2
+
+        # window[i] has, at bit j, the pot i - 2 places along from bit j
+        window = [here << 2, here << 1, here, here >> 1, here >> 2]
+        window = [w & mask for w in window]
+        inverse = [~w & mask for w in window]
+
+        future = 0
+        for pattern, result in enumerate(self.table):
+            if not result:
+                continue
+
+            hits = mask
+            for i in range(5):
+                on = pattern & (1 << (4 - i))
+                hits &= window[i] if on else inverse[i]
+
+            future |= hits
+
+        self.bits = future
+        self.offset -= 2
+        self.generation += 1
+        self._normalize()
+
+    def plant_indexes(self):
+        bits = reversed(bin(self.bits)[2:])
+        return [self.offset + i for i, c in enumerate(bits) if c == "1"]
+
+    def sum(self):
+        return sum(self.plant_indexes())
+
+    def find_stable(self):
+        prev = self.bits
+        while True:
+            self.do_generation()
+            if self.bits == prev:
+                return
+
+            prev = self.bits
+
+    def _state(self):
+        return self.bits, self.offset
+
+    def _shift(self, delta):
+        self.offset += delta
+
 
 class Rules:
     def __init__(self, lines):
@@ -92,23 +220,31 @@ class Rules:
     def __getitem__(self, item) -> bool:
         return item in self.rules
 
+    def table(self) -> list[bool]:
+        # indexed by the five pots as bits, leftmost pot highest
+        return [
+            tuple(bool(n & (1 << (4 - i))) for i in range(5)) in self.rules
+            for n in range(32)
+        ]
+
+
+def main():
+    with open('d12.txt') as f:
+        lines = [line.strip() for line in f]
+        rules = Rules(lines[2:])
+        plants1 = BitPlantLine(lines[0], rules)
+        plants2 = BitPlantLine(lines[0], rules)
 
-with open('d12.txt') as f:
-    lines = [line.strip() for line in f]
-    rules = Rules(lines[2:])
-    plants1 = PlantLine(lines[0], rules)
-    plants2 = PlantLine(lines[0], rules)
+    # part 1
+    for i in range(20):
+        plants1.do_generation()
 
-# part 1
-for i in range(20):
-    plants1.do_generation()
+    print(f"part 1: {plants1.sum()}")
 
-print(f"part 1: {plants1.sum()}")
+    # part 2
+    plants2.advance_to(50_000_000_000)
+    print(f"part 2: {plants2.sum()}")
 
-# part 2
-plants2.find_stable()
-indexes = plants2.plant_indexes()
 
-delta = 50_000_000_000 - plants2.generation
-at_time = [i + delta for i in indexes]
-print(f"part 2: {(sum(at_time))}")
+if __name__ == "__main__":
+    main()
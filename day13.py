@@ -1,197 +1,553 @@
-from collections import Counter
+from collections import defaultdict
 from collections.abc import Collection
-from dataclasses import dataclass, field
-from enum import Enum
+from dataclasses import dataclass
+import heapq
 import itertools
-from typing import Iterator
+from operator import attrgetter
+import struct
+import sys
 
 
 class Map:
-    def __init__(self, plan, carts):
+    def __init__(self, plan, width, carts):
         self.plan = plan
+        self.width = width
+        self.steps = steps_for(width)
         self.carts = carts
         self._tick = 0
+        self._links = {}
+        self._base = None
+        self.recorder = None
 
     @classmethod
     def parse(cls, lines):
-        plan = []
-        table = str.maketrans("<>^v", "--||")
-        plan = [list(line) for line in lines]
-        carts = CartSet()
+        lines = [line.rstrip("\n") for line in lines]
+        width = max(len(line) for line in lines)
+        plan = bytearray(width * len(lines))
+        carts = CartSet(width)
 
-        for y, line in enumerate(plan):
+        for y, line in enumerate(lines):
             for x, char in enumerate(line):
-                if char in "><^v":
-                    carts.add(Cart(x, y, char))
-                    plan[y][x] = char.translate(table)
+                if char in HEADINGS:
+                    carts.add(Cart(x, y, char, width))
+                    char = "-" if char in "<>" else "|"
 
-        return cls(plan, carts)
+                plan[y * width + x] = KINDS.index(char) if char in KINDS else 0
+
+        return cls(plan, width, carts)
 
     def __str__(self):
-        ret = []
-        for y, row in enumerate(self.plan):
-            line = []
+        # the track never changes, so only the carts need drawing each time
+        if self._base is None:
+            self._base = base_frame(self.plan, self.width)
 
-            for x, char in enumerate(row):
-                if cart := self.carts.cart_at(x, y):
-                    line.append(cart.direction)
-                else:
-                    line.append(char)
+        carts = ((cart.pos, cart.state) for cart in self.carts.at.values())
+        return render(self._base, self.width, carts)
+
+    def record(self, f):
+        # from here on, write what changes every tick to f (see Recorder)
+        self.recorder = Recorder(f, self)
+
+    def _ticked(self, partial=False):
+        if not partial:
+            self._tick += 1
+
+        if self.recorder:
+            self.recorder.record(self._tick + partial, self.carts)
 
-            ret.append("".join(line))
+    def kind_at(self, x, y):
+        return self.plan[y * self.width + x]
 
-        return "\n".join(ret)
+    def link(self, x, y, direction):
+        # The next curve or intersection along the track from (x, y), and
+        # how far away it is. Straight runs don't change, so each one only
+        # gets walked once.
+        key = (x, y, direction)
+        if key not in self._links:
+            dx, dy = STEPS[direction]
+            dist = 0
+            while True:
+                x, y, dist = x + dx, y + dy, dist + 1
+                if self.kind_at(x, y) in NODES:
+                    break
+
+            self._links[key] = (x, y, dist)
+
+        return self._links[key]
 
     def tick(self):
         for cart in self.carts:
-            cart.move(self.plan)
+            self.carts.move(cart, self.plan, self.steps)
 
-        self._tick += 1
+        self._ticked()
+
+    def run_until_crash(self, engine="tick"):
+        if engine == "event":
+            return to_output(next(EventSim(self).crashes()))
 
-    def run_until_crash(self):
         while True:
             for cart in self.carts:
                 # print(f"{(cart.x, cart.y)} ", end="")
-                cart.move(self.plan)
+                self.carts.move(cart, self.plan, self.steps)
 
                 if crash := self.carts.get_crash():
+                    self._ticked(partial=True)
                     return to_output(crash)
 
-    def last_cart_standing(self):
+            self._ticked()
+
+    def last_cart_standing(self, engine="tick"):
+        if engine == "event":
+            return to_output(EventSim(self).last_cart_standing())
+
         while True:
             for cart in self.carts:
-                cart.move(self.plan)
+                self.carts.move(cart, self.plan, self.steps)
 
                 if crash := self.carts.get_crash():
                     self.carts.remove(crash)
 
+            self._ticked()
             if len(self.carts) == 1:
-                return to_output(self.carts.carts[0].coords())
+                return to_output(next(iter(self.carts)).coords())
 
 
+# Carts are kept in a list (in tick order, more or less) and indexed by
+# position, so finding a crash is a dict lookup as each cart moves. Carts
+# that have crashed drop out of the index straight away, and out of the
+# list at the start of the next tick.
 class CartSet(Collection):
-    def __init__(self):
+    def __init__(self, width):
+        self.width = width
         self.carts = []
+        self.at = {}
+        self.crashes = []
 
     def add(self, cart):
         self.carts.append(cart)
+        self.at[cart.pos] = cart
 
     def __len__(self):
-        return len(self.carts)
+        return len(self.at)
 
     def __contains__(self, coords):
-        return bool(self.cart_at(*coords))
+        return self.cart_at(*coords) is not None
 
     def __iter__(self):
-        yield from sorted(self.carts)
+        if len(self.carts) != len(self.at):
+            self.carts = [c for c in self.carts if self.live(c)]
+
+        # carts only move one square a tick, so this is nearly sorted
+        # already and timsort makes short work of it (and pos order is
+        # reading order)
+        self.carts.sort(key=attrgetter("pos"))
+        at = self.at
+        for cart in self.carts:
+            if at.get(cart.pos) is cart:
+                yield cart
+
+    def live(self, cart):
+        return self.at.get(cart.pos) is cart
 
     def cart_at(self, x, y):
-        for cart in self.carts:
-            if cart.coords() == (x, y):
-                return cart
+        return self.at.get(y * self.width + x)
 
-        return None
+    def move(self, cart, plan, steps):
+        at = self.at
+        del at[cart.pos]
+        cart.move(plan, steps)
+
+        if cart.pos in at:
+            del at[cart.pos]
+            self.crashes.append(cart.coords())
+        else:
+            at[cart.pos] = cart
 
     def get_crash(self):
-        locs = Counter((c.x, c.y) for c in self.carts)
-        if len(locs) == len(self.carts):
+        return self.crashes[0] if self.crashes else None
+
+    def remove(self, coords):
+        # the wrecked carts get swept out of self.carts on the next tick
+        x, y = coords
+        self.at.pop(y * self.width + x, None)
+        self.crashes = [crash for crash in self.crashes if crash != coords]
+
+
+# A straight run of track on one axis between two curves/intersections. A
+# cart on a leg is at u + d * (tick - t) along the axis, fixed on the other,
+# from tick t until it reaches the far end at tick end.
+@dataclass
+class Leg:
+    segment: tuple
+    horizontal: bool
+    fixed: int
+    u: int
+    d: int
+    t: int
+    end: int
+
+    def at(self, tick):
+        u = self.u + self.d * (tick - self.t)
+        return (u, self.fixed) if self.horizontal else (self.fixed, u)
+
+    def order(self, tick):
+        # reading order of where the cart was at the end of this tick
+        x, y = self.at(tick)
+        return y, x
+
+
+# Simulates carts a whole leg at a time, rather than a square per tick.
+# Carts can only hit each other when they're on the same leg (which we can
+# work out as soon as the second one gets on) or when they both come to the
+# same curve/intersection (which we check as they arrive), so everything
+# else is just arithmetic. Events are handled in (tick, reading order of the
+# cart that moves), which is the order the tick model would see them in.
+class EventSim:
+    def __init__(self, track):
+        self.track = track
+        self.carts = list(track.carts)
+        self.alive = set(range(len(self.carts)))
+        self.legs = {}
+        self.on_segment = defaultdict(set)
+        self.arrivals = {}
+        self.events = []
+        self.tick = 0
+        self._seq = itertools.count()
+
+        for i, cart in enumerate(self.carts):
+            self.start_leg(i, 0)
+
+    def push(self, tick, order, *event):
+        heapq.heappush(self.events, (tick, order, next(self._seq), event))
+
+    def start_leg(self, i, tick):
+        cart = self.carts[i]
+        x, y = cart.coords()
+        end_x, end_y, dist = self.track.link(x, y, cart.direction)
+        dx, dy = STEPS[cart.direction]
+        horizontal = dy == 0
+        d = dx or dy
+
+        # name the segment after its top/left end, so carts going either
+        # way along it agree on what it's called
+        if d < 0:
+            lower = (end_x, end_y)
+        elif self.track.kind_at(x, y) in NODES:
+            lower = (x, y)
+        else:
+            lower = self.track.link(x, y, OPPOSITE[cart.direction])[:2]
+
+        leg = Leg(
+            segment=(horizontal, lower),
+            horizontal=horizontal,
+            fixed=y if horizontal else x,
+            u=x if horizontal else y,
+            d=d,
+            t=tick,
+            end=tick + dist,
+        )
+        self.legs[i] = leg
+
+        for j in self.on_segment[leg.segment]:
+            if j in self.alive:
+                self.check_pair(i, j)
+
+        self.on_segment[leg.segment].add(i)
+        self.push(leg.end, leg.order(leg.end - 1), "arrive", i)
+
+    def check_pair(self, a, b):
+        # Both carts are on the same leg; work out if (and when) one of them
+        # moves into the other while they're both on it.
+        la, lb = self.legs[a], self.legs[b]
+        first, last = max(la.t, lb.t) + 1, min(la.end, lb.end)
+        if first > last:
             return
 
-        # oh no!
-        for loc, count in locs.items():
-            if count > 1:
-                return loc
+        # L is the one ahead in reading order (so it moves first)
+        ua, ub = la.at(first - 1), lb.at(first - 1)
+        ua, ub = (ua[0], ub[0]) if la.horizontal else (ua[1], ub[1])
+        (ul, l, ll), (ur, r, lr) = sorted([(ua, a, la), (ub, b, lb)])
+        gap = ur - ul
+
+        if ll.d == 1 and lr.d == -1:
+            # head on: they close by two a tick, until L runs into R (gap 1)
+            # or R runs into where L just went (gap 2)
+            k = (gap - 1) // 2
+            tick = first + k
+            if gap - 2 * k == 1:
+                mover, leg, where = l, ll, ur - k
+            else:
+                mover, leg, where = r, lr, ul + k + 1
+        elif ll.d == 1 and lr.d == 1 and gap == 1:
+            # L moves first, straight into the back of R
+            tick, mover, leg, where = first, l, ll, ur
+        else:
+            return
 
-    def remove(self, coords):
-        self.carts = [c for c in self.carts if c.coords() != coords]
+        if tick > last:
+            return
+
+        coords = (where, ll.fixed) if ll.horizontal else (ll.fixed, where)
+        self.push(tick, leg.order(tick - 1), "crash", l, r, coords)
+
+    def arrive(self, i, tick, order):
+        leg = self.legs[i]
+        x, y = leg.at(tick)
+        self.on_segment[leg.segment].discard(i)
+
+        # someone's already there if they got there earlier this tick, or
+        # got there last tick and haven't moved off yet
+        if prev := self.arrivals.get((x, y)):
+            when, j = prev
+            still_there = when == tick - 1 and order < (y, x)
+            if j in self.alive and (when == tick or still_there):
+                return j, (x, y)
+
+        self.arrivals[x, y] = (tick, i)
+
+        cart = self.carts[i]
+        cart.pos = y * self.track.width + x
+        cart.turn(self.track.kind_at(x, y))
+        self.start_leg(i, tick)
+        return None
+
+    def crashes(self):
+        # yields the location of every crash in order, removing the carts
+        # involved as it goes
+        while self.events:
+            tick, order, _, event = heapq.heappop(self.events)
+            self.tick = tick
+
+            match event:
+                case ("arrive", i):
+                    if i not in self.alive:
+                        continue
+
+                    if not (crash := self.arrive(i, tick, order)):
+                        continue
+
+                    j, coords = crash
+                    pair = (i, j)
+                case ("crash", a, b, coords):
+                    pair = (a, b)
+
+            if not all(i in self.alive for i in pair):
+                continue
+
+            self.alive.difference_update(pair)
+            yield coords
+
+    def last_cart_standing(self):
+        if len(self.alive) > 1:
+            for _ in self.crashes():
+                if len(self.alive) <= 1:
+                    break
+
+        if not self.alive:
+            return None
+
+        # where it is at the end of the tick the last crash happened in
+        last = next(iter(self.alive))
+        return self.legs[last].at(max(self.tick, 1))
+
+
+# Recordings are a header (width, height, the plan, and every cart's
+# starting pos and state), then for every tick, its number and the carts
+# that changed: (cart number, pos, state), with pos GONE once it crashes.
+MAGIC = b"D13R"
+HEADER = struct.Struct("<4sII")
+COUNT = struct.Struct("<I")
+CART = struct.Struct("<IB")
+TICK = struct.Struct("<II")
+CHANGE = struct.Struct("<IIB")
+GONE = 0xFFFFFFFF
+
+
+class Recorder:
+    def __init__(self, f, track):
+        self.f = f
+        self.ids = {}
+        self.last = {}
+
+        height = len(track.plan) // track.width
+        f.write(HEADER.pack(MAGIC, track.width, height))
+        f.write(track.plan)
+
+        carts = list(track.carts)
+        f.write(COUNT.pack(len(carts)))
+        for i, cart in enumerate(carts):
+            self.ids[cart] = i
+            self.last[cart] = (cart.pos, cart.state)
+            f.write(CART.pack(cart.pos, cart.state))
+
+    def record(self, tick, carts):
+        changes = []
+
+        for cart, was in list(self.last.items()):
+            if not carts.live(cart):
+                changes.append(CHANGE.pack(self.ids[cart], GONE, 0))
+                del self.last[cart]
+            elif (now := (cart.pos, cart.state)) != was:
+                changes.append(CHANGE.pack(self.ids[cart], *now))
+                self.last[cart] = now
+
+        self.f.write(TICK.pack(tick, len(changes)))
+        self.f.write(b"".join(changes))
+
+
+# Plays back a recording one tick at a time, without any simulating.
+class Replay:
+    def __init__(self, f):
+        self.f = f
+
+        magic, self.width, height = HEADER.unpack(f.read(HEADER.size))
+        assert magic == MAGIC, "not a day 13 recording"
+        self.base = base_frame(f.read(self.width * height), self.width)
+
+        (n,) = COUNT.unpack(f.read(COUNT.size))
+        self.carts = dict(enumerate(CART.iter_unpack(f.read(CART.size * n))))
+        self.tick = 0
+
+    def __iter__(self):
+        while header := self.f.read(TICK.size):
+            tick, n = TICK.unpack(header)
+            changes = self.f.read(CHANGE.size * n)
+            for i, pos, state in CHANGE.iter_unpack(changes):
+                if pos == GONE:
+                    del self.carts[i]
+                else:
+                    self.carts[i] = (pos, state)
+
+            self.tick = tick
+            yield tick
+
+    def __str__(self):
+        return render(self.base, self.width, self.carts.values())
+
+
+def base_frame(plan, width):
+    chars = bytes(plan).translate(KIND_CHARS)
+    return b"\n".join(chars[i:i + width] for i in range(0, len(chars), width))
+
+
+def render(base, width, carts):
+    # carts are (pos, state) pairs; each row of base is one byte longer
+    # than the plan's because of the newline, hence pos + y
+    frame = bytearray(base)
+    for pos, state in carts:
+        frame[pos + pos // width] = HEADING_CHARS[state // 3]
+
+    return frame.decode()
 
 
 def to_output(tup):
     return ",".join(map(str, tup))
 
 
-Turn = Enum("Turn", ["LEFT", "STRAIGHT", "RIGHT"])
-
-DIRECTIONS = {
-    "\\": {
-        "<": "^",
-        ">": "v",
-        "v": ">",
-        "^": "<",
-    },
-    "/": {
-        "<": "v",
-        ">": "^",
-        "v": "<",
-        "^": ">",
-    },
+# The plan is one byte per square, holding its index in KINDS, and a cart's
+# heading is its index in HEADINGS (clockwise from up). A cart's state packs
+# its heading with which turn it takes at the next intersection (left,
+# straight, right) as heading * 3 + turn, and TRANSITIONS[kind * 12 + state]
+# is its state after entering a square of that kind.
+KINDS = " -|/\\+"
+NODES = {KINDS.index(c) for c in "/\\+"}
+HEADINGS = "^>v<"
+KIND_CHARS = bytes.maketrans(bytes(range(len(KINDS))), KINDS.encode())
+HEADING_CHARS = HEADINGS.encode()
+
+
+def transition(kind, heading, turn):
+    match KINDS[kind]:
+        case "/":
+            return heading ^ 1, turn
+        case "\\":
+            return 3 - heading, turn
+        case "+":
+            return (heading + turn - 1) % 4, (turn + 1) % 3
+
+    return heading, turn
+
+
+TRANSITIONS = bytes(
+    heading * 3 + turn
+    for kind in range(len(KINDS))
+    for state in range(12)
+    for heading, turn in [transition(kind, *divmod(state, 3))]
+)
+
+
+def steps_for(width):
+    # how far along the plan one square is, for each of the 12 states
+    by_heading = [-width, 1, width, -1]
+    return tuple(by_heading[state // 3] for state in range(12))
+
+
+STEPS = {
+    "<": (-1, 0),
+    ">": (1, 0),
+    "^": (0, -1),
+    "v": (0, 1),
 }
 
-TURNS = {
-    Turn.LEFT: {
-        "<": "v",
-        ">": "^",
-        "v": ">",
-        "^": "<",
-    },
-    Turn.RIGHT: {
-        "<": "^",
-        ">": "v",
-        "v": "<",
-        "^": ">",
-    },
-    Turn.STRAIGHT: {
-        "<": "<",
-        ">": ">",
-        "v": "v",
-        "^": "^",
-    },
+OPPOSITE = {
+    "<": ">",
+    ">": "<",
+    "^": "v",
+    "v": "^",
 }
 
 
-@dataclass
 class Cart:
-    x: int
-    y: int
-    direction: str
-    next_turn: Iterator[Turn] = field(
-        default_factory=lambda: itertools.cycle([Turn.LEFT, Turn.STRAIGHT, Turn.RIGHT])
-    )
+    __slots__ = ("pos", "state", "width")
+
+    def __init__(self, x, y, direction, width):
+        self.pos = y * width + x
+        self.state = HEADINGS.index(direction) * 3
+        self.width = width
 
-    def __lt__(self, other):
-        if self.y == other.y:
-            return self.x < other.x
+    @property
+    def x(self):
+        return self.pos % self.width
 
-        return self.y < other.y
+    @property
+    def y(self):
+        return self.pos // self.width
+
+    @property
+    def direction(self):
+        return HEADINGS[self.state // 3]
 
     def coords(self):
         return self.x, self.y
 
-    def move(self, plan):
-        match self.direction:
-            case "<":
-                self.x -= 1
-            case ">":
-                self.x += 1
-            case "v":
-                self.y += 1
-            case "^":
-                self.y -= 1
-
-        char = plan[self.y][self.x]
-        if char in "-|":
-            return
+    def move(self, plan, steps):
+        self.pos += steps[self.state]
+        self.state = TRANSITIONS[plan[self.pos] * 12 + self.state]
 
-        if char == "+":
-            turn = next(self.next_turn)
-            self.direction = TURNS[turn][self.direction]
-            return
+    def turn(self, kind):
+        self.state = TRANSITIONS[kind * 12 + self.state]
+
+
+def main():
+    if sys.argv[1:2] == ["replay"]:
+        # python day13.py replay FILE [TICK]: show the map as of that tick
+        at = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        with open(sys.argv[2], "rb") as f:
+            replay = Replay(f)
+            if at > 0:
+                for tick in replay:
+                    if tick >= at:
+                        break
+
+            print(f"tick {replay.tick}:\n{replay}")
+        return
 
-        self.direction = DIRECTIONS[char][self.direction]
+    with open("d13.txt") as f:
+        lines = f.readlines()
 
+    print("part 1: ", Map.parse(lines).run_until_crash())
+    print("part 2: ", Map.parse(lines).last_cart_standing())
 
-with open("d13.txt") as f:
-    lines = f.readlines()
 
-print("part 1: ", Map.parse(lines).run_until_crash())
-print("part 2: ", Map.parse(lines).last_cart_standing())
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import random
+import sys
+import time
+
+from day13 import Map
+
+
+def generate(width, height, n_loops, n_carts, seed=0):
+    # Overlapping rectangular loops, with no two edges sharing a row or a
+    # column, so every crossing is a clean intersection.
+    rnd = random.Random(seed)
+    grid = [[" "] * width for _ in range(height)]
+    rows, cols = set(), set()
+    loops = []
+
+    while len(loops) < n_loops:
+        y1, y2 = sorted(rnd.sample(range(height), 2))
+        x1, x2 = sorted(rnd.sample(range(width), 2))
+        if y2 - y1 < 2 or x2 - x1 < 2:
+            continue
+
+        if {y1, y2} & rows or {x1, x2} & cols:
+            continue
+
+        rows |= {y1, y2}
+        cols |= {x1, x2}
+        loops.append((x1, y1, x2, y2))
+
+    for x1, y1, x2, y2 in loops:
+        for x in range(x1 + 1, x2):
+            for y in (y1, y2):
+                grid[y][x] = "+" if grid[y][x] == "|" else "-"
+
+        for y in range(y1 + 1, y2):
+            for x in (x1, x2):
+                grid[y][x] = "+" if grid[y][x] == "-" else "|"
+
+        grid[y1][x1] = grid[y2][x2] = "/"
+        grid[y1][x2] = grid[y2][x1] = "\\"
+
+    straight = [
+        (x, y)
+        for y in range(height)
+        for x in range(width)
+        if grid[y][x] in "-|"
+    ]
+    for x, y in rnd.sample(straight, n_carts):
+        grid[y][x] = rnd.choice("<>" if grid[y][x] == "-" else "^v")
+
+    return ["".join(row) + "\n" for row in grid]
+
+
+def bench_ticks(lines, ticks):
+    track = Map.parse(lines)
+    moves = 0
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        moves += len(track.carts)
+        track.tick()
+
+    elapsed = time.perf_counter() - start
+    return moves, elapsed
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    for n_carts in [100, 1000, 5000]:
+        lines = generate(size, size, size // 20, n_carts)
+        moves, elapsed = bench_ticks(lines, 200)
+        print(
+            f"{size}x{size}, {n_carts:>5} carts: "
+            f"{moves:>9,} moves in {elapsed:6.2f}s, "
+            f"{elapsed / moves * 1e9:6.0f} ns/move"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,163 @@
+import mmap
+import os
+import struct
+
+
 def digits(lst) -> str:
     return ''.join(map(str, lst))
 
 
 class ElfRecipes:
-    def __init__(self):
-        self.scores = [3, 7]
-        self.e1 = 0
-        self.e2 = 1
+    def __init__(self, scores=None, e1=0, e2=1):
+        self.scores = bytearray([3, 7]) if scores is None else scores
+        self.e1 = e1
+        self.e2 = e2
+
+    def _grow(self, n):
+        # do rounds until there are at least n scores
+        scores, e1, e2 = self.scores, self.e1, self.e2
+        length = len(scores)
+
+        while length < n:
+            new = scores[e1] + scores[e2]
+            if new >= 10:
+                scores.append(1)
+                scores.append(new - 10)
+                length += 2
+            else:
+                scores.append(new)
+                length += 1
 
-    def _do_round(self):
-        new = self.scores[self.e1] + self.scores[self.e2]
-        if new >= 10:
-            self.scores.extend(divmod(new, 10))
-        else:
-            self.scores.append(new)
+            e1 = (e1 + scores[e1] + 1) % length
+            e2 = (e2 + scores[e2] + 1) % length
 
-        self.e1 = (self.e1 + self.scores[self.e1] + 1) % len(self.scores)
-        self.e2 = (self.e2 + self.scores[self.e2] + 1) % len(self.scores)
+        self.e1, self.e2 = e1, e2
 
     def do_rounds(self, n):
-        for _ in range(n + 10):
-            self._do_round()
+        self._grow(n + 10)
 
         return digits(self.scores[n:n+10])
 
+    def find_sequence(self, seq, chunk=1 << 16):
+        # Make a chunk of rounds at a time and search just the new scores
+        # (plus enough of the old ones to catch a match straddling the
+        # two), so nothing gets rebuilt or rescanned from round to round.
+        target = bytes(int(c) for c in seq)
+        scores = self.scores
+        searched = 0
+
+        while (idx := scores.find(target, searched)) < 0:
+            searched = max(0, len(scores) - len(target) + 1)
+            self._grow(len(scores) + chunk)
+
+        return idx
+
+
+# The scoreboard never changes, so this keeps it in a file (memory-mapped
+# for reading) that only gets longer when someone asks for scores past the
+# end of it. The header holds how many scores there are and where the elves
+# were, so making more can pick up where the last run left off.
+class RecipeStream:
+    HEADER = struct.Struct("<4sQQQ")
+    MAGIC = b"D14S"
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, 2, 0, 1))
+                f.write(bytes([3, 7]))
+
+        self.f = open(path, "r+b")
+        self._map()
+
+    def _map(self):
+        self.mm = mmap.mmap(self.f.fileno(), 0)
+        magic, self.length, self.e1, self.e2 = self.HEADER.unpack_from(self.mm)
+        assert magic == self.MAGIC, "not a day 14 scoreboard"
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+    def __len__(self):
+        return self.length
+
+    def scores(self, start, end):
+        self.ensure(end)
+        base = self.HEADER.size
+        return self.mm[base + start:base + end]
+
+    def ensure(self, n):
+        if self.length >= n:
+            return
+
+        # at least double it, so asking for a bit more each time doesn't
+        # mean rewriting the file each time
+        base = self.HEADER.size
+        scores = bytearray(self.mm[base:base + self.length])
+        recipes = ElfRecipes(scores, self.e1, self.e2)
+        recipes._grow(max(n, 2 * self.length))
+
+        self.mm.close()
+        self.f.seek(base + self.length)
+        self.f.write(recipes.scores[self.length:])
+        self.f.seek(0)
+        header = (len(recipes.scores), recipes.e1, recipes.e2)
+        self.f.write(self.HEADER.pack(self.MAGIC, *header))
+        self.f.flush()
+        self._map()
+
+    def do_rounds(self, n):
+        return digits(self.scores(n, n + 10))
+
     def find_sequence(self, seq):
-        n = len(seq)
+        target = bytes(int(c) for c in seq)
+        base = self.HEADER.size
+        searched = 0
+
         while True:
-            self._do_round()
-            last = digits(self.scores[-n-1:])
+            idx = self.mm.find(target, base + searched, base + self.length)
+            if idx >= 0:
+                return idx - base
+
+            searched = max(0, self.length - len(target) + 1)
+            self.ensure(2 * self.length)
+
+    def find_sequences(self, seqs, block=1 << 20):
+        # One pass over the scoreboard, a block at a time, with an mmap.find
+        # in each block for every sequence not found yet. Searches run
+        # len(seq) - 1 scores into the next block, so a match straddling
+        # the two isn't missed; returns {seq: index}.
+        targets = {seq: bytes(int(c) for c in seq) for seq in seqs}
+        longest = max(map(len, targets.values()), default=0)
+        found = {}
+        base = self.HEADER.size
+        start = 0
+
+        while len(found) < len(targets):
+            stop = start + block
+            self.ensure(stop + longest - 1)
+
+            for seq, target in targets.items():
+                if seq in found:
+                    continue
+
+                end = base + stop + len(target) - 1
+                idx = self.mm.find(target, base + start, end)
+                if idx >= 0:
+                    found[seq] = idx - base
+
+            start = stop
+
+        return found
+
 
-            if (idx := last.find(seq)) >= 0:
-                return len(self.scores) - n - (1 - idx)
+def main():
+    print("part 1:", ElfRecipes().do_rounds(409551))
+    print("part 2:", ElfRecipes().find_sequence('409551'))
 
+    # print(ElfRecipes().find_sequence('515891'))
 
-print("part 1:", ElfRecipes().do_rounds(409551))
-print("part 2:", ElfRecipes().find_sequence('409551'))
 
-# print(ElfRecipes().find_sequence('515891'))
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-from enum import StrEnum
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from dataclasses import dataclass
-import math
+from enum import StrEnum
+from multiprocessing import Array
 
 
 def main():
@@ -13,16 +14,23 @@ def main():
     print("part 2:", elves_must_win(lines))
 
 
-def elves_must_win(lines):
+def elves_must_win(lines, workers=1, engine="bfs", max_rounds=None):
+    # max_rounds caps every probe, raising Stalemate if one runs past it
+    if workers > 1:
+        return elves_must_win_parallel(lines, workers, engine, max_rounds)
+
     print("searching for elves best attack power")
     L, R = 3, 200
     elf_score = 0
 
+    if (start := elf_checkpoint(lines, engine, max_rounds)) is None:
+        return elf_score
+
     while L <= R:
         atk = (L + R) // 2
-        grid = Grid(lines, elf_atk=atk)
+        grid = Grid.restore(start, elf_atk=atk, engine=engine)
         try:
-            elf_score = grid.play_game(True)
+            elf_score = grid.play_game(True, max_rounds=max_rounds)
             R = atk - 1
             print(f"  elves win with atk={atk}")
         except ElfDied:
@@ -32,6 +40,95 @@ def elves_must_win(lines):
     return elf_score
 
 
+def elf_checkpoint(lines, engine="bfs", max_rounds=None):
+    # Until an elf lands a blow, every attack power plays out the same, so
+    # there's no need for each probe to start from the beginning. Returns
+    # None if an elf dies before any elf attacks, since then nothing wins.
+    grid = Grid(lines, engine=engine)
+    try:
+        start = grid.checkpoint_before_elf_attack(max_rounds)
+    except ElfDied:
+        return None
+
+    print(f"  probes start from round {start.rounds}")
+    return start
+
+
+# The parallel search keeps every worker busy with some attack power between
+# the best known losing and winning ones, and narrows that gap as results
+# come back. Workers can see the gap too (through _known, which is shared
+# with them), and give up on any run that's fallen outside it.
+_known = None
+
+
+def _init_worker(known):
+    global _known
+    _known = known
+
+
+def _probe(start, atk, engine, max_rounds):
+    def cancelled():
+        dies, wins = _known
+        return not dies < atk < wins
+
+    grid = Grid.restore(start, elf_atk=atk, engine=engine)
+    try:
+        score = grid.play_game(True, cancelled, max_rounds)
+        return atk, score
+    except ElfDied:
+        return atk, None
+
+
+def elves_must_win_parallel(lines, workers, engine="bfs", max_rounds=None):
+    print(f"searching for elves best attack power with {workers} workers")
+    known = Array("i", [2, 201])  # highest atk that loses, lowest that wins
+    scores = {}
+
+    if (start := elf_checkpoint(lines, engine, max_rounds)) is None:
+        return 0
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(known,)
+    ) as pool:
+        running = {}
+
+        while known[1] - known[0] > 1:
+            busy = set(running.values())
+            free = [
+                atk for atk in range(known[0] + 1, known[1]) if atk not in busy
+            ]
+            want = workers - len(running)
+            for i in range(min(want, len(free))):
+                atk = free[(i + 1) * len(free) // (want + 1)]
+                probe = pool.submit(_probe, start, atk, engine, max_rounds)
+                running[probe] = atk
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                if future.cancelled():  # cancelled before it started
+                    continue
+
+                try:
+                    atk, score = future.result()
+                except Cancelled:
+                    continue
+
+                if score is None:
+                    print(f"  elf dies with atk={atk}.")
+                    known[0] = max(known[0], atk)
+                else:
+                    print(f"  elves win with atk={atk}")
+                    scores[atk] = score
+                    known[1] = min(known[1], atk)
+
+            for future, atk in running.items():
+                if not known[0] < atk < known[1]:
+                    future.cancel()
+
+    return scores.get(known[1], 0)
+
+
 class Kind(StrEnum):
     WALL = "#"
     OPEN = "."
@@ -50,208 +147,414 @@ class Kind(StrEnum):
     def is_attacker(self):
         return self == self.ELF or self == self.GOBLIN
 
+    def enemy(self):
+        return self.GOBLIN if self == self.ELF else self.ELF
 
-@dataclass
-class Tile:
-    kind: Kind
 
-    def is_attacker(self):
-        return False
+class Unit:
+    __slots__ = ("kind", "pos", "hp", "atk")
 
-    def is_open(self):
-        return self.kind == Kind.OPEN
+    def __init__(self, kind, pos, atk=3):
+        self.kind = kind
+        self.pos = pos
+        self.hp = 200
+        self.atk = atk
 
+    def __repr__(self):
+        return f"<{self.kind.name} at {self.pos}, hp={self.hp}>"
 
-@dataclass
-class Attacker:
-    kind: Kind
-    hp: int = 200
-    atk: int = 3
 
-    def is_attacker(self):
-        return True
+class ElfDied(Exception):
+    pass
 
-    def is_open(self):
-        return False
 
+class Cancelled(Exception):
+    pass
 
-class ElfDied(Exception):
+
+class Stalemate(Exception):
     pass
 
 
+# Everything needed to pick a game back up at the start of a round, apart
+# from the elves' attack power.
+@dataclass(frozen=True)
+class Snapshot:
+    max_c: int
+    cave: bytes
+    units: tuple
+    rounds: int
+
+
+OPEN = ord(Kind.OPEN)
+WALL = ord(Kind.WALL)
+FAR = float("inf")
+
+
+# For one faction, how far every open square is from the nearest square in
+# range of an enemy, and which in-range square that is (the first in reading
+# order on ties). A unit moves to whichever open neighbor has the smallest
+# (distance, square), which is exactly the step the puzzle asks for.
+#
+# Rather than being rebuilt for every move, the field is repaired around
+# the squares that changed since it was last used: squares downstream of one
+# that got blocked or stopped being in range are wiped, then everything near
+# a change is relaxed again from the surviving distances. Only the side's
+# own moves are repaired like that; Grid drops the field whenever an enemy
+# moves or dies, and searches afresh until the enemies stay put for a round.
+#
+# Grid uses it for engine="field", which is worth it when one side mostly
+# holds still (dug in, or already fighting) while the other walks a long
+# way to reach it. With both sides on the move, as in most caves, the
+# breadth first search Grid uses by default is as fast or faster.
+class DistanceField:
+    def __init__(self, grid, kind):
+        self.cave = grid.cave
+        self.adjacent = grid.adjacent
+        self.enemy = ord(kind.enemy())
+        self.dist = [FAR] * len(self.cave)
+        self.src = [FAR] * len(self.cave)
+        self.changed = set()
+
+        self._relax([
+            (0, pos, pos)
+            for pos in range(len(self.cave))
+            if self._in_range(pos)
+        ])
+
+    def _in_range(self, pos):
+        return self.cave[pos] == OPEN and any(
+            self.cave[n] == self.enemy for n in self.adjacent[pos]
+        )
+
+    def step(self, start):
+        # where a unit at start should move, or None if no target is reachable
+        if self.changed:
+            self._repair()
+
+        best, step = (FAR, FAR), None
+        for n in self.adjacent[start]:
+            if self.cave[n] == OPEN and (self.dist[n], self.src[n]) < best:
+                best, step = (self.dist[n], self.src[n]), n
+
+        return step
+
+    def _relax(self, seeds):
+        # Spreads (distance, in-range square, square) labels breadth first.
+        # Each layer is sorted, so a square takes the first in-range square
+        # in reading order at its distance before any later one.
+        cave, adjacent, dist, src = self.cave, self.adjacent, self.dist, self.src
+        layers = {}
+        for d, s, pos in seeds:
+            layers.setdefault(d, []).append((s, pos))
+
+        d = min(layers, default=0)
+        while layers:
+            layer = sorted(layers.pop(d, ()))
+            nxt = layers.setdefault(d + 1, []) if layer else None
+
+            for s, pos in layer:
+                if (d, s) < (dist[pos], src[pos]):
+                    dist[pos], src[pos] = d, s
+                    for n in adjacent[pos]:
+                        if cave[n] == OPEN and (d + 1, s) < (dist[n], src[n]):
+                            nxt.append((s, n))
+
+            d += 1
+
+    def _repair(self):
+        cave, adjacent, dist, src = self.cave, self.adjacent, self.dist, self.src
+        near = set(self.changed)
+        for pos in self.changed:
+            near.update(adjacent[pos])
+        self.changed = set()
+
+        # Squares that lose their distance: those that got blocked or are no
+        # longer in range, then, a layer at a time, those left with no
+        # neighbor one step nearer the same in-range square.
+        layers = {}
+        for pos in near:
+            if dist[pos] < FAR and (
+                cave[pos] != OPEN or dist[pos] == 0 and not self._in_range(pos)
+            ):
+                layers.setdefault(dist[pos], []).append(pos)
+
+        wiped = set(pos for layer in layers.values() for pos in layer)
+        d = min(layers, default=0)
+        while layers:
+            for pos in layers.pop(d, ()):
+                for n in adjacent[pos]:
+                    if (
+                        n in wiped
+                        or dist[n] != d + 1
+                        or src[n] != src[pos]
+                        or any(
+                            m not in wiped and dist[m] == d and src[m] == src[n]
+                            for m in adjacent[n]
+                        )
+                    ):
+                        continue
+
+                    wiped.add(n)
+                    layers.setdefault(d + 1, []).append(n)
+
+            d += 1
+
+        for pos in wiped:
+            dist[pos] = src[pos] = FAR
+
+        # only squares near a change can have come into range
+        seeds = [(0, pos, pos) for pos in near if self._in_range(pos)]
+        for pos in near | wiped:
+            if cave[pos] == OPEN:
+                seeds.extend(
+                    (dist[n] + 1, src[n], pos)
+                    for n in adjacent[pos]
+                    if dist[n] < FAR
+                )
+
+        self._relax(seeds)
+
+
+# The cave is one bytearray of Kind characters, row after row, and squares
+# are indexes into it. Units are also kept in a roster per faction and by
+# position, so finding targets or checking a square never means scanning
+# the whole map. The cave has to be walled all the way round, since the
+# neighbors of a square on the edge would wrap onto the next row.
 class Grid:
-    def __init__(self, lines, elf_atk=3):
+    def __init__(self, lines, elf_atk=3, engine="bfs"):
+        self.engine = engine
         self.max_r = len(lines)
         self.max_c = len(lines[0])
+        self.offsets = (-self.max_c, -1, 1, self.max_c)  # reading order
+
+        self.cave = bytearray("".join(lines), "ascii")
+        self.adjacent = [
+            ()
+            if char == WALL
+            else tuple(n for n in self.neighbors(pos) if self.cave[n] != WALL)
+            for pos, char in enumerate(self.cave)
+        ]
+        self.fields = {}
+        self.unsettled = set()  # factions whose enemies moved last round
+        self.disturbed = set()  # and this round
+        self.units = {Kind.ELF: [], Kind.GOBLIN: []}
+        self.unit_at = {}
+        self.rounds = 0
+        self.elf_attacks = 0
+
+        for pos, char in enumerate(self.cave):
+            kind = Kind.from_str(chr(char))
+            if kind.is_attacker():
+                self._add(Unit(kind, pos, elf_atk if kind == Kind.ELF else 3))
+
+    def _add(self, unit):
+        self.units[unit.kind].append(unit)
+        self.unit_at[unit.pos] = unit
+
+    def snapshot(self):
+        units = tuple((u.kind, u.pos, u.hp) for u in self.attackers())
+        return Snapshot(self.max_c, bytes(self.cave), units, self.rounds)
 
-        self.g = {}
+    @classmethod
+    def restore(cls, snapshot, elf_atk=3, engine="bfs"):
+        lines = [
+            snapshot.cave[i:i + snapshot.max_c].decode()
+            for i in range(0, len(snapshot.cave), snapshot.max_c)
+        ]
+        grid = cls(lines, elf_atk=elf_atk, engine=engine)
+        grid.rounds = snapshot.rounds
 
-        for r, line in enumerate(lines):
-            for c, char in enumerate(line):
-                kind = Kind.from_str(char)
-                self.g[r, c] = Attacker(kind) if kind.is_attacker() else Tile(kind)
-                if kind == Kind.ELF:
-                    self.g[r, c].atk = elf_atk
+        # the units' hp is the only thing the cave doesn't say
+        for kind, pos, hp in snapshot.units:
+            grid.unit_at[pos].hp = hp
 
-    def __str__(self):
-        lines = []
-        for r in range(self.max_r):
-            line = []
-            for c in range(self.max_c):
-                line.append(self.g[r, c].kind)
+        return grid
 
-            lines.append("".join(line))
+    def checkpoint_before_elf_attack(self, max_rounds=None):
+        # Plays until a round where an elf attacks, and returns a snapshot
+        # from the start of that round (or of the last round, if the game
+        # ends first, or of round max_rounds, where every probe will stop).
+        while max_rounds is None or self.rounds < max_rounds:
+            snapshot = self.snapshot()
+            attacks = self.elf_attacks
 
-        return "\n".join(lines)
+            if not self.do_round(True) or self.elf_attacks > attacks:
+                return snapshot
 
-    def attackers(self):
-        return sorted(pos for pos, ent in self.g.items() if ent.is_attacker())
+            self.rounds += 1
 
-    def non_walls(self):
-        return sorted(pos for pos, ent in self.g.items() if ent.kind != Kind.WALL)
+        return self.snapshot()
 
-    def play_game(self, elf_priority=False):
-        rounds_completed = 0
+    def __str__(self):
+        text = self.cave.decode()
+        return "\n".join(
+            text[i:i + self.max_c] for i in range(0, len(text), self.max_c)
+        )
 
+    def attackers(self):
+        return sorted(self.unit_at.values(), key=lambda unit: unit.pos)
+
+    def play_game(self, elf_priority=False, cancelled=None, max_rounds=None):
         while True:
+            if cancelled and cancelled():
+                raise Cancelled
+
+            if max_rounds is not None and self.rounds >= max_rounds:
+                raise Stalemate
+
             go_on = self.do_round(elf_priority)
             if not go_on:
                 break
 
-            rounds_completed += 1
+            self.rounds += 1
 
-        hp = sum(self.g[pos].hp for pos in self.attackers())
-        return hp * rounds_completed
+        hp = sum(unit.hp for unit in self.attackers())
+        return hp * self.rounds
 
     def do_round(self, elf_priority=False):
-        to_move = self.attackers()
+        # Goes through the units themselves, not the squares they started
+        # on, so a unit that steps into a square freed by a death this
+        # round doesn't get a second turn there.
+        self.unsettled, self.disturbed = self.disturbed, set()
 
-        for pos in to_move:
-            who = self.g[pos]
-            if who.is_open():  # it dead
+        for who in self.attackers():
+            if who.hp <= 0:  # it dead
                 continue
 
             if not self.targets_for(who):
                 return False
 
-            pos = self.move(who, pos)
+            self.move(who)
+
+            if target := self.best_target(who):
+                if who.kind == Kind.ELF:
+                    self.elf_attacks += 1
 
-            if tpos := self.best_target(who, pos):
-                target = self.g[tpos]
                 target.hp -= who.atk
                 if target.hp <= 0:
                     if elf_priority and target.kind == Kind.ELF:
                         raise ElfDied
 
-                    self.g[tpos] = Tile(Kind.OPEN)
+                    self.remove(target)
 
         return True
 
-    def move(self, who, pos):
-        targets = self.targets_for(who)
-        assert targets
+    def remove(self, unit):
+        self.units[unit.kind].remove(unit)
+        del self.unit_at[unit.pos]
+        self.cave[unit.pos] = OPEN
+        self._changed(unit.kind, unit.pos)
 
-        if self.adjacent_targets(who, pos):
-            return pos
+    def move(self, who):
+        if self.adjacent_targets(who):
+            return
 
-        in_range = self.in_range_of(targets)
-        dists = {
-            pos: dist
-            for pos, dist in self.distances_from(pos).items()
-            if pos in in_range
-        }
+        field = None
+        if self.engine == "field":
+            field = self.fields.get(who.kind)
+            settled = who.kind not in self.unsettled | self.disturbed
+            if field is None and settled:
+                field = self.fields[who.kind] = DistanceField(self, who.kind)
 
-        if not dists:
-            return pos
+        next_pos = field.step(who.pos) if field else self.bfs_step(who)
 
-        best_dist = min(dist for dist in dists.values())
-        nearest = min(pos for pos, dist in dists.items() if dist == best_dist)
+        if next_pos is None:
+            return
 
-        next_pos = self.step_toward(pos, nearest)
-        self.g[next_pos] = who
-        self.g[pos] = Tile(Kind.OPEN)
-        return next_pos
+        self.cave[who.pos] = OPEN
+        del self.unit_at[who.pos]
+        self._changed(who.kind, who.pos, next_pos)
 
-    def adjacent_targets(self, who, pos):
-        targets = self.targets_for(who)
-        return [n for n in self.neighbors(pos) if n in targets]
+        who.pos = next_pos
+        self.cave[next_pos] = ord(who.kind)
+        self.unit_at[next_pos] = who
 
-    def best_target(self, who, pos):
-        targets = self.adjacent_targets(who, pos)
-        if not targets:
+    def bfs_step(self, who):
+        in_range = self.in_range_of(self.targets_for(who))
+        nearest = self.nearest(who.pos, in_range)
+        if nearest is None:
             return None
 
-        def key(k):
-            unit = self.g[k]
-            return (unit.hp, k)
+        return self.step_toward(who.pos, nearest)
 
-        return sorted(targets, key=key)[0]
+    def _changed(self, kind, *squares):
+        # A unit moving or dying only nudges its own side's field, but it
+        # moves the squares its enemies are heading for, and repairing that
+        # means relabelling most of their field. So that field is dropped,
+        # and its side searches afresh until its enemies settle for a round.
+        enemies = kind.enemy()
+        self.disturbed.add(enemies)
+        self.fields.pop(enemies, None)
 
-    def targets_for(self, who):
+        if field := self.fields.get(kind):
+            field.changed.update(squares)
+
+    def adjacent_targets(self, who):
+        enemy = who.kind.enemy()
         return [
-            pos
-            for pos, ent in self.g.items()
-            if ent.is_attacker() and ent.kind != who.kind
+            unit
+            for n in self.neighbors(who.pos)
+            if (unit := self.unit_at.get(n)) and unit.kind == enemy
         ]
 
-    def in_range_of(self, targets):
-        return {n for pos in targets for n in self.open_neighbors(pos)}
-
-    def _dist_prev(self, start, target=None):
-        dists, prev = {}, {}
-        todo, seen = set(), set()
-
-        todo.add(start)
-        dists[start] = 0
+    def best_target(self, who):
+        targets = self.adjacent_targets(who)
+        if not targets:
+            return None
 
-        while todo:
-            _, pos = min((dists[item], item) for item in todo if item in dists)
-            todo.remove(pos)
-            seen.add(pos)
+        return min(targets, key=lambda unit: (unit.hp, unit.pos))
 
-            if target and target == pos:
-                break
+    def targets_for(self, who):
+        return self.units[who.kind.enemy()]
 
-            for v in [n for n in self.open_neighbors(pos) if n not in seen]:
-                todo.add(v)
+    def in_range_of(self, targets):
+        return {n for unit in targets for n in self.open_neighbors(unit.pos)}
 
-                alt = dists[pos] + 1
-                if alt < dists.get(v, math.inf):
-                    dists[v] = alt
-                    prev[v] = pos
+    def _layers(self, start):
+        # breadth first over open squares: yields the squares at distance
+        # 0 (just start), 1, 2, ... from start
+        cave, offsets = self.cave, self.offsets
+        seen = {start}
+        layer = [start]
 
-        return dists, prev
+        while layer:
+            yield layer
 
-    def distances_from(self, pos):
-        dists, _ = self._dist_prev(pos)
-        return dists
+            nxt = []
+            for pos in layer:
+                for d in offsets:
+                    n = pos + d
+                    if cave[n] == OPEN and n not in seen:
+                        seen.add(n)
+                        nxt.append(n)
 
-    def step_toward(self, start, end):
-        _, prev = self._dist_prev(start, end)
-        assert end in prev and end != start
+            layer = nxt
 
-        path = []
+    def nearest(self, start, squares):
+        # the closest of squares to start, first in reading order on ties
+        for layer in self._layers(start):
+            if hits := [pos for pos in layer if pos in squares]:
+                return min(hits)
 
-        cur = end
-        while cur != start:
-            path.append(cur)
-            cur = prev[cur]
+        return None
 
-        return path[-1]
+    def step_toward(self, start, end):
+        # Search back from end to find which of start's neighbors is
+        # closest to it (first in reading order on ties): that's the step.
+        # The unit at start isn't open, so no path goes through it. (This
+        # is the puzzle's rule; following one shortest path back from end
+        # can pick a later neighbor when two are equally close.)
+        first_steps = self.open_neighbors(start)
+        step = self.nearest(end, first_steps)
+        assert step is not None
+        return step
 
     def neighbors(self, pos):
-        r, c = pos
-        ret = []
-        for r2, c2 in [(r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)]:
-            if (r2, c2) not in self.g:
-                continue
-
-            ret.append((r2, c2))
-
-        return sorted(ret)
+        return [pos + d for d in self.offsets]
 
     def open_neighbors(self, pos):
-        return [n for n in self.neighbors(pos) if self.g[n].is_open()]
+        return [n for n in self.neighbors(pos) if self.cave[n] == OPEN]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from day15 import Grid, Stalemate, elves_must_win
+
+# (width, height, wall density, units)
+CAVES = [
+    (32, 32, 0.15, 30),
+    (64, 64, 0.15, 60),
+    (96, 96, 0.15, 90),
+    (96, 96, 0.3, 30),
+]
+ENGINES = ["bfs", "field"]
+MAX_ROUNDS = 500
+
+
+def generate(width, height, walls, n_units, seed=0):
+    # Walled all the way round, with scattered rock inside. Open squares
+    # that can't reach the largest open area are filled in, so every unit
+    # can at least in principle get to every other.
+    rnd = random.Random(seed)
+    grid = [["#"] * width for _ in range(height)]
+    for y in range(1, height - 1):
+        for x in range(1, width - 1):
+            if rnd.random() >= walls:
+                grid[y][x] = "."
+
+    best = set()
+    seen = set()
+    for y in range(height):
+        for x in range(width):
+            if grid[y][x] != "." or (y, x) in seen:
+                continue
+
+            area = {(y, x)}
+            todo = [(y, x)]
+            while todo:
+                cy, cx = todo.pop()
+                steps = (cy - 1, cx), (cy, cx - 1), (cy, cx + 1), (cy + 1, cx)
+                for ny, nx in steps:
+                    if grid[ny][nx] == "." and (ny, nx) not in area:
+                        area.add((ny, nx))
+                        todo.append((ny, nx))
+
+            seen |= area
+            if len(area) > len(best):
+                best = area
+
+    for y, x in seen - best:
+        grid[y][x] = "#"
+
+    for y, x in rnd.sample(sorted(best), n_units):
+        grid[y][x] = rnd.choice("EG")
+
+    return ["".join(row) for row in grid]
+
+
+class TimedGrid(Grid):
+    # counts time spent choosing and making moves, which is all of the
+    # pathfinding
+    path_time = 0.0
+
+    def move(self, who):
+        start = time.perf_counter()
+        super().move(who)
+        self.path_time += time.perf_counter() - start
+
+
+def bench_game(lines, engine):
+    grid = TimedGrid(lines, engine=engine)
+    start = time.perf_counter()
+    try:
+        outcome = grid.play_game(max_rounds=MAX_ROUNDS)
+    except Stalemate:
+        outcome = None
+
+    elapsed = time.perf_counter() - start
+    return {
+        "outcome": outcome,
+        "rounds": grid.rounds,
+        "seconds": elapsed,
+        "rounds_per_second": grid.rounds / elapsed,
+        "path_seconds": grid.path_time,
+        "other_seconds": elapsed - grid.path_time,
+    }
+
+
+def bench_search(lines, engine):
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(io.StringIO()):  # it reports every probe
+            outcome = elves_must_win(
+                lines, engine=engine, max_rounds=MAX_ROUNDS
+            )
+    except Stalemate:
+        outcome = None  # some attack power never finished
+
+    return {"outcome": outcome, "seconds": time.perf_counter() - start}
+
+
+def peak_memory(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    out = sys.argv[1] if len(sys.argv) > 1 else "day15_bench.json"
+    results = []
+
+    for width, height, walls, n_units in CAVES:
+        lines = generate(width, height, walls, n_units)
+
+        for engine in ENGINES:
+            game = bench_game(lines, engine)
+            game["peak_bytes"] = peak_memory(bench_game, lines, engine)
+
+            search = bench_search(lines, engine)
+
+            results.append({
+                "width": width,
+                "height": height,
+                "walls": walls,
+                "units": n_units,
+                "engine": engine,
+                "play_game": game,
+                "elves_must_win": search,
+            })
+
+            print(
+                f"{width}x{height}, walls {walls:.2f}, {n_units:>3} units, "
+                f"{engine:>5}: {game['rounds']:>3} rounds, "
+                f"{game['rounds_per_second']:7.1f} rounds/s, "
+                f"{game['path_seconds'] / game['seconds']:4.0%} pathfinding, "
+                f"peak {game['peak_bytes'] / 1024:8.0f} KiB"
+                f", search {search['seconds']:.2f}s"
+            )
+
+    with open(out, "w") as f:
+        json.dump({"max_rounds": MAX_ROUNDS, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,76 @@
-import operator
-import re
+from itertools import chain
+
+import numpy as np
 
 
 def main():
     with open("d16.txt") as f:
-        lines = [line.strip() for line in f]
-
-    funcs = make_funcs()
-
-    p1, possibles = part_one(funcs, lines[:3127])
-    print("part 1:", p1)
-
-    opcodes = resolve_ops(funcs, possibles)
-    print("part 2:", run_program(opcodes, lines[3130:]))
-
-
-def part_one(funcs, lines):
+        samples, program = read_input(f)
+
+        p1, possibles = part_one_array(samples)
+        print("part 1:", p1)
+
+        names = resolve_ops(possibles)
+        print("part 2:", run_program(decode(names, program)))
+
+
+def read_input(lines, chunk=1 << 16):
+    # Splits the input, in one pass, into a generator of samples, up to chunk
+    # of them at a time as (n, 3, 4) arrays, and one of program lines. The
+    # samples end at the first line that isn't blank and isn't part of a
+    # sample, so they have to be used up before the program.
+    lines = iter(lines)
+    rest = []
+    started_program = False
+
+    def samples():
+        nonlocal started_program
+        batch = []
+        for line in lines:
+            if line.startswith("Before:"):
+                try:
+                    batch += (line, next(lines), next(lines))
+                except StopIteration:
+                    raise ValueError(
+                        f"input ends partway through a sample: {line!r}"
+                    ) from None
+                if len(batch) == 3 * chunk:
+                    yield parse_samples(batch)
+                    batch = []
+            elif line.strip():
+                rest.append(line)
+                break
+
+        started_program = True
+        if batch:
+            yield parse_samples(batch)
+
+    def program():
+        if not started_program:
+            raise RuntimeError("read all the samples before the program")
+
+        for line in chain(rest, lines):
+            if line.strip():
+                yield line
+
+    return samples(), program()
+
+
+def parse_samples(lines):
+    text = " ".join(lines).replace("Before:", "").replace("After:", "")
+    text = text.translate(PUNCTUATION)
+    return np.fromstring(text, dtype=np.int64, sep=" ").reshape(-1, 3, 4)
+
+
+def part_one(batches):
+    # one sample at a time, from the same batches as part_one_array
     opcodes = {op: set() for op in range(16)}
     multiples = 0
 
-    for i in range(0, len(lines), 4):
-        before = reg_from_line(lines[i])
-        instr = [int(n) for n in lines[i + 1].split()]
-        after = reg_from_line(lines[i + 2])
-        matches = check(funcs, before, instr, after)
+    for before, instr, after in chain.from_iterable(
+        batch.tolist() for batch in batches
+    ):
+        matches = check(before, instr, after)
 
         if len(matches) >= 3:
             multiples += 1
@@ -35,25 +82,86 @@ def part_one(funcs, lines):
     return multiples, opcodes
 
 
-def reg_from_line(line):
-    m = re.match(r"(?:Before|After):\s+\[(\d+), (\d+), (\d+), (\d+)\]", line)
-    assert m is not None, line
-    return [int(n) for n in m.groups()]
+def part_one_array(batches):
+    # part_one, a whole batch of samples from read_input at a time
+    multiples = 0
+    hits = {}
+
+    for batch in batches:
+        before, instr, after = batch[:, 0], batch[:, 1], batch[:, 2]
+        matches = check_all(before, instr, after)
+
+        counts = sum(match.astype(np.int64) for match in matches.values())
+        multiples += int((counts >= 3).sum())
+
+        # how many samples with each opcode every name explains
+        for name, match in matches.items():
+            n = np.bincount(instr[:, 0], weights=match, minlength=16)
+            hits[name] = hits.get(name, 0) + n
+
+    opcodes = {
+        op: {name for name, n in hits.items() if n[op]} for op in range(16)
+    }
+
+    return multiples, opcodes
+
+
+def check_all(before, instr, after):
+    # For each instruction name, which samples it explains. An operand that
+    # should be a register but isn't 0-3 just means no match (check would
+    # raise IndexError instead).
+    rows = np.arange(len(before))
+    _, a, b, c = instr.T
+    ok_a, ok_b, ok_c = a < 4, b < 4, c < 4
+    ra = before[rows, np.minimum(a, 3)]
+    rb = before[rows, np.minimum(b, 3)]
+
+    results = {
+        "addr": (ra + rb, ok_a & ok_b),
+        "addi": (ra + b, ok_a),
+        "mulr": (ra * rb, ok_a & ok_b),
+        "muli": (ra * b, ok_a),
+        "banr": (ra & rb, ok_a & ok_b),
+        "bani": (ra & b, ok_a),
+        "borr": (ra | rb, ok_a & ok_b),
+        "bori": (ra | b, ok_a),
+        "setr": (ra, ok_a),
+        "seti": (a, True),
+        "gtir": (a > rb, ok_b),
+        "gtri": (ra > b, ok_a),
+        "gtrr": (ra > rb, ok_a & ok_b),
+        "eqir": (a == rb, ok_b),
+        "eqri": (ra == b, ok_a),
+        "eqrr": (ra == rb, ok_a & ok_b),
+    }
 
+    # every register but c has to come through unchanged
+    c = np.minimum(c, 3)
+    same = before == after
+    same[rows, c] = True
+    untouched = same.all(axis=1) & ok_c
+    target = after[rows, c]
+
+    return {
+        name: untouched & valid & (value == target)
+        for name, (value, valid) in results.items()
+    }
 
-def check(funcs, before, instr, after):
+
+def check(before, instr, after):
     match = []
+    _, a, b, c = instr
 
-    for label, fn in funcs.items():
+    for label, fn in INSTRUCTIONS.items():
         reg = list(before)  # do not reuse the one we just did!
-        fn(instr, reg)
+        fn(reg, a, b, c)
         if tuple(reg) == tuple(after):
             match.append(label)
 
     return match
 
 
-def resolve_ops(funcs, possibles):
+def resolve_ops(possibles):
     seen = set()
     lookup = {}
 
@@ -62,73 +170,111 @@ def resolve_ops(funcs, possibles):
         seen.add(k)
 
         to_remove = possibles[k].pop()
-        lookup[k] = funcs[to_remove]
+        lookup[k] = to_remove
         for s in possibles.values():
             s.discard(to_remove)
 
     return lookup
 
 
-def run_program(funcs, lines):
+def decode(names, lines):
+    # Each instruction is parsed once, into the function for its opcode and
+    # its operands, so running it is a single call. Lazily, so a program
+    # can stream through run_program; list() it to run it more than once.
+    for line in lines:
+        op, a, b, c = map(int, line.split())
+        yield INSTRUCTIONS[names[op]], a, b, c
+
+
+def run_program(program):
     reg = [0, 0, 0, 0]
 
-    for line in lines:
-        instr = [int(n) for n in line.split()]
-        fn = funcs[instr[0]]
-        fn(instr, reg)
+    for fn, a, b, c in program:
+        fn(reg, a, b, c)
 
     return reg[0]
 
 
 # helpers
 
+PUNCTUATION = str.maketrans({c: " " for c in "[],"})
 
-def make_funcs():
-    reg = lambda registers, k: registers[k]  # noqa
-    imm = lambda registers, k: k  # noqa
 
-    return {
-        "addr": make_op(operator.add, reg),
-        "addi": make_op(operator.add, imm),
-        "mulr": make_op(operator.mul, reg),
-        "muli": make_op(operator.mul, imm),
-        "banr": make_op(operator.and_, reg),
-        "bani": make_op(operator.and_, imm),
-        "borr": make_op(operator.or_, reg),
-        "bori": make_op(operator.or_, imm),
-        "setr": make_assn(reg),
-        "seti": make_assn(imm),
-        "gtir": make_cmp(operator.gt, imm, reg),
-        "gtri": make_cmp(operator.gt, reg, imm),
-        "gtrr": make_cmp(operator.gt, reg, reg),
-        "eqir": make_cmp(operator.eq, imm, reg),
-        "eqri": make_cmp(operator.eq, reg, imm),
-        "eqrr": make_cmp(operator.eq, reg, reg),
-    }
+# The instructions: every operand is passed in, and whether it's a register
+# or a value is baked into the function instead of looked up each time.
+
+
+def addr(reg, a, b, c):
+    reg[c] = reg[a] + reg[b]
+
+
+def addi(reg, a, b, c):
+    reg[c] = reg[a] + b
+
+
+def mulr(reg, a, b, c):
+    reg[c] = reg[a] * reg[b]
+
+
+def muli(reg, a, b, c):
+    reg[c] = reg[a] * b
+
+
+def banr(reg, a, b, c):
+    reg[c] = reg[a] & reg[b]
+
+
+def bani(reg, a, b, c):
+    reg[c] = reg[a] & b
+
+
+def borr(reg, a, b, c):
+    reg[c] = reg[a] | reg[b]
+
+
+def bori(reg, a, b, c):
+    reg[c] = reg[a] | b
+
+
+def setr(reg, a, b, c):
+    reg[c] = reg[a]
+
+
+def seti(reg, a, b, c):
+    reg[c] = a
+
+
+def gtir(reg, a, b, c):
+    reg[c] = 1 if a > reg[b] else 0
+
+
+def gtri(reg, a, b, c):
+    reg[c] = 1 if reg[a] > b else 0
+
 
+def gtrr(reg, a, b, c):
+    reg[c] = 1 if reg[a] > reg[b] else 0
 
-def make_op(op, lookup):
-    def fn(instr, reg):
-        _, a, b, c = instr
-        reg[c] = op(reg[a], lookup(reg, b))
 
-    return fn
+def eqir(reg, a, b, c):
+    reg[c] = 1 if a == reg[b] else 0
 
 
-def make_cmp(op, lookup_a, lookup_b):
-    def fn(instr, reg):
-        _, a, b, c = instr
-        reg[c] = 1 if op(lookup_a(reg, a), lookup_b(reg, b)) else 0
+def eqri(reg, a, b, c):
+    reg[c] = 1 if reg[a] == b else 0
 
-    return fn
 
+def eqrr(reg, a, b, c):
+    reg[c] = 1 if reg[a] == reg[b] else 0
 
-def make_assn(lookup):
-    def fn(instr, reg):
-        _, a, _, c = instr
-        reg[c] = lookup(reg, a)
 
-    return fn
+INSTRUCTIONS = {
+    fn.__name__: fn
+    for fn in [
+        addr, addi, mulr, muli, banr, bani, borr, bori,
+        setr, seti, gtir, gtri, gtrr, eqir, eqri, eqrr,
+    ]
+}
 
 
 if __name__ == "__main__":
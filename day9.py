@@ -1,3 +1,10 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import time
+from typing import Iterable, Iterator
+
+
 class Node:
     def __init__(self, value, prev=None, nxt=None):
         self.value = value
@@ -53,17 +60,153 @@ class Circle:
         return 0
 
 
-def play_game(n_players: int, end_at: int):
-    c = Circle()
+# Same ring buffer, but the links live in two flat arrays indexed by marble
+# value rather than in one Node per marble, which keeps the big runs small.
+class ArrayCircle:
+    def __init__(self, capacity: int):
+        self.prev = array("I", [0]) * (capacity + 1)
+        self.next = array("I", [0]) * (capacity + 1)
+
+        self.cur = 0
+        self.length = 1
+
+    def __repr__(self) -> str:
+        cur = self.cur
+        lst = []
+        for i in range(self.length):
+            lst.append(cur)
+            cur = self.next[cur]
+
+        return repr(lst)
+
+    def add_marble(self, n: int) -> int:
+        prev, nxt = self.prev, self.next
+
+        if n % 23 == 0:
+            cur = self.cur
+            for _ in range(7):
+                cur = prev[cur]
+
+            # remove this marble
+            before, after = prev[cur], nxt[cur]
+            nxt[before] = after
+            prev[after] = before
+            self.cur = after
+            self.length -= 1
+            return n + cur
+
+        # we skip a marble here
+        before = nxt[self.cur]
+        after = nxt[before]
+
+        prev[n] = before
+        nxt[n] = after
+        nxt[before] = n
+        prev[after] = n
+
+        self.cur = n
+        self.length += 1
+
+        return 0
+
+    def add_block(self, first: int) -> int:
+        # Adds marbles first..first+22 in one go; first must be 1 mod 23, so
+        # the last of them is the scoring marble. Each new marble lands just
+        # after the next old marble, so the old ones end up interleaved with
+        # the new: cur, a0, first, a1, first+1, ..., a21, first+21, a22.
+        prev, nxt = self.prev, self.next
+        last = first + 22
+
+        before = nxt[self.cur]
+        for k in range(first, last):
+            after = nxt[before]
+            prev[k] = before
+            nxt[k] = after
+            nxt[before] = k
+            prev[after] = k
+            before = after
+
+        # seven back from the last new marble is the old one between first+17
+        # and first+18
+        removed = prev[first + 18]
+        nxt[first + 17] = first + 18
+        prev[first + 18] = first + 17
+
+        self.cur = first + 18
+        self.length += 21
+
+        return last + removed
+
+
+ENGINES = {
+    "nodes": lambda end_at: Circle(),
+    "array": ArrayCircle,
+    "block": ArrayCircle,
+}
+
+
+def play_game(n_players: int, end_at: int, engine: str = "nodes") -> list[int]:
+    c = ENGINES[engine](end_at)
     players = [0] * n_players
 
-    for i in range(1, end_at + 1):
+    i = 1
+    if engine == "block":
+        # add_block needs 23 distinct marbles after cur, so warm up one marble
+        # at a time until the circle is big enough
+        while i <= end_at and (i % 23 != 1 or c.length < 24):
+            players[i % n_players] += c.add_marble(i)
+            i += 1
+
+        while i + 22 <= end_at:
+            players[(i + 22) % n_players] += c.add_block(i)
+            i += 23
+
+    for i in range(i, end_at + 1):
         idx = i % n_players
         score = c.add_marble(i)
         players[idx] += score
 
-    print(max(players))
+    return players
+
+
+@dataclass
+class GameResult:
+    n_players: int
+    end_at: int
+    scores: list[int]
+    elapsed: float
+
+    def high_score(self) -> int:
+        return max(self.scores)
+
+
+def timed_game(n_players: int, end_at: int, engine: str) -> GameResult:
+    start = time.perf_counter()
+    scores = play_game(n_players, end_at, engine=engine)
+    return GameResult(n_players, end_at, scores, time.perf_counter() - start)
+
+
+def play_games(
+    configs: Iterable[tuple[int, int]],
+    engine: str = "block",
+    workers: int | None = None,
+) -> Iterator[GameResult]:
+    # Runs each (n_players, end_at) game in a process pool, yielding results
+    # as they finish, not in the order they were given.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(timed_game, n_players, end_at, engine)
+            for n_players, end_at in configs
+        ]
+
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main():
+    print(max(play_game(473, 70904)))
+    print(max(play_game(473, 70904 * 100, engine="block")))
 
 
-play_game(473, 70904)
-play_game(473, 70904 * 100)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import sys
+import time
+
+from day9 import play_game
+
+
+def bench(n_players: int, end_at: int, engine: str) -> tuple[int, float]:
+    start = time.perf_counter()
+    best = max(play_game(n_players, end_at, engine=engine))
+    return best, time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10**7, 10**8]
+
+    for end_at in sizes:
+        marble, marble_t = bench(473, end_at, "array")
+        block, block_t = bench(473, end_at, "block")
+        assert marble == block, (marble, block)
+
+        print(
+            f"{end_at:>12,} marbles: "
+            f"per-marble {marble_t:7.2f}s, "
+            f"block {block_t:7.2f}s "
+            f"({marble_t / block_t:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+from day11 import best_for_serials
+
+
+def test_best_for_serials():
+    assert best_for_serials([18]) == {18: ((33, 45), (90, 269, 16))}
+
+
+def test_best_for_no_serials():
+    assert best_for_serials([]) == {}
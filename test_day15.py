@@ -0,0 +1,48 @@
+from day15 import Grid
+
+
+def test_step_ties_go_first_in_reading_order():
+    # The goblin at the bottom has two equally short ways to the square
+    # beside the elf, starting left or right; it has to start left.
+    grid = Grid([
+        "#######",
+        "#.E...#",
+        "#.....#",
+        "#G..#.#",
+        "#.#..G#",
+        "#.G...#",
+        "#######",
+    ])
+    grid.do_round()
+
+    assert str(grid) == "\n".join([
+        "#######",
+        "#E....#",
+        "#G....#",
+        "#...#G#",
+        "#.#...#",
+        "#G....#",
+        "#######",
+    ])
+
+
+def test_unit_moving_into_a_dead_units_square_acts_once():
+    # The top goblin kills the elf below it; the goblin to the elf's left
+    # then steps into its square, and mustn't take the elf's turn as well.
+    grid = Grid([
+        "#######",
+        "#..G..#",
+        "#.GE.E#",
+        "#.....#",
+        "#######",
+    ])
+    grid.unit_at[2 * 7 + 3].hp = 3
+    grid.do_round()
+
+    assert str(grid) == "\n".join([
+        "#######",
+        "#..G..#",
+        "#..GE.#",
+        "#.....#",
+        "#######",
+    ])
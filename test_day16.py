@@ -0,0 +1,46 @@
+import pytest
+
+from day16 import part_one, part_one_array, read_input
+
+SAMPLES = [
+    "Before: [3, 2, 1, 1]",
+    "9 2 1 2",
+    "After:  [3, 2, 2, 1]",
+    "",
+    "Before: [0, 1, 2, 3]",
+    "4 0 3 3",
+    "After:  [0, 1, 2, 3]",
+    "",
+    "Before: [1, 0, 3, 2]",
+    "7 1 2 0",
+    "After:  [0, 0, 3, 2]",
+]
+
+
+def test_read_input_finds_the_program():
+    samples, program = read_input(SAMPLES + ["", "", "", "9 2 1 2", "4 0 3 3"])
+
+    assert [batch.shape for batch in samples] == [(3, 3, 4)]
+    assert list(program) == ["9 2 1 2", "4 0 3 3"]
+
+
+def test_part_one_array_matches_part_one():
+    for chunk in [1, 2, 64]:
+        samples, _ = read_input(SAMPLES, chunk=chunk)
+        one_at_a_time, _ = read_input(SAMPLES, chunk=chunk)
+
+        assert part_one_array(samples) == part_one(one_at_a_time)
+
+
+def test_truncated_sample():
+    samples, _ = read_input(SAMPLES[:-1])
+
+    with pytest.raises(ValueError, match="partway through a sample"):
+        list(samples)
+
+
+def test_program_before_samples():
+    _, program = read_input(SAMPLES + ["", "9 2 1 2"])
+
+    with pytest.raises(RuntimeError, match="samples before the program"):
+        list(program)